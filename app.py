@@ -1,24 +1,48 @@
-from flask import Flask, render_template, request
-from crawler import WebCrawler
+from flask import Flask, render_template, request, jsonify, Response
 from content_processor import ContentProcessor
 from comparator import ContentComparator
-from crawler_pwa import PWAWebCrawler
+from crawl_pool import CrawlWorkerPool
 from curl_crawler import CurlCrawler
+from job_queue import get_job_queue, submit_comparison
 import os
 from dotenv import load_dotenv
-import time
-
-# Load environment variables
-load_dotenv()
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 app = Flask(__name__)
 
-# Initialize components
-crawler = WebCrawler()
-content_processor = ContentProcessor(os.getenv('OPENAI_API_KEY'))
-comparator = ContentComparator(os.getenv('OPENAI_API_KEY'))
-pwa_crawler = PWAWebCrawler()
-curl_crawler = CurlCrawler()
+# Components are built by init_components() rather than at import time:
+# crawl workers are spawned processes that re-import this module, and they
+# must not pay for OpenAI clients, tiktoken or the job queue
+content_processor = None
+comparator = None
+curl_crawler = None
+crawl_pool = None
+job_queue = None
+_init_lock = threading.Lock()
+
+def init_components():
+    """Load environment variables and build the app's components once"""
+    global content_processor, comparator, curl_crawler, crawl_pool, job_queue
+    with _init_lock:
+        if crawl_pool is not None:
+            return
+
+        # Load environment variables
+        load_dotenv()
+
+        content_processor = ContentProcessor(os.getenv('OPENAI_API_KEY'))
+        comparator = ContentComparator(os.getenv('OPENAI_API_KEY'), content_processor)
+        curl_crawler = CurlCrawler()
+        # Durable queue shared with worker nodes (see worker.py)
+        job_queue = get_job_queue()
+        # Crawling runs in supervised worker processes, started on first crawl
+        crawl_pool = CrawlWorkerPool()
+
+@app.before_request
+def ensure_components():
+    init_components()
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -34,20 +58,21 @@ def index():
                 curl2 = curl_crawler.get_curl_from_browser(url2)
                 
                 # Extract content using curl
-                content1 = curl_crawler.extract_content(curl1)
-                content2 = curl_crawler.extract_content(curl2)
+                content1 = crawl_pool.extract_content('curl', curl1)
+                content2 = crawl_pool.extract_content('curl', curl2)
+                curl_commands = {'url1': curl1, 'url2': curl2}
             else:
                 # Auto-detect if either URL is a PWA/React site
-                is_pwa1 = pwa_crawler.is_pwa_or_react(url1)
-                is_pwa2 = pwa_crawler.is_pwa_or_react(url2)
+                is_pwa1 = crawl_pool.is_pwa_or_react(url1)
+                is_pwa2 = crawl_pool.is_pwa_or_react(url2)
                 
                 # Use appropriate crawler
                 use_pwa_crawler = is_pwa1 or is_pwa2
-                selected_crawler = pwa_crawler if use_pwa_crawler else crawler
+                selected_crawler = 'pwa' if use_pwa_crawler else 'selenium'
                 
                 # Crawl websites
-                content1 = selected_crawler.extract_content(url1)
-                content2 = selected_crawler.extract_content(url2)
+                content1 = crawl_pool.extract_content(selected_crawler, url1)
+                content2 = crawl_pool.extract_content(selected_crawler, url2)
 
             if not content1 or not content2:
                 return render_template('index.html', error="Failed to fetch content from one or both URLs")
@@ -59,9 +84,6 @@ def index():
             # Compare contents (now synchronous)
             comparison_result = comparator.compare_contents(processed_content1, processed_content2)
 
-            # Add a small delay to ensure loading state is visible
-            time.sleep(1)
-
             return render_template('index.html', 
                                 comparison_result=comparison_result,
                                 is_pwa1=is_pwa1 if 'is_pwa1' in locals() else None,
@@ -75,5 +97,104 @@ def index():
 
     return render_template('index.html')
 
+def sse_event(event, data):
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/compare/stream', methods=['GET'])
+def compare_stream():
+    """Run a comparison, pushing each stage to the browser as it finishes"""
+    url1 = request.args.get('url1')
+    url2 = request.args.get('url2')
+    use_curl = request.args.get('use_curl') in ('1', 'true', 'on')
+    if not url1 or not url2:
+        return jsonify({'error': 'url1 and url2 are required'}), 400
+
+    def generate():
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                if use_curl:
+                    targets = {
+                        1: curl_crawler.get_curl_from_browser(url1),
+                        2: curl_crawler.get_curl_from_browser(url2)
+                    }
+                    selected_crawler = 'curl'
+                    yield sse_event('curl', {'url1': targets[1], 'url2': targets[2]})
+                else:
+                    # Detect both sites in parallel, reporting each verdict as it arrives
+                    targets = {1: url1, 2: url2}
+                    futures = {executor.submit(crawl_pool.is_pwa_or_react, url): side
+                               for side, url in targets.items()}
+                    is_pwa = {}
+                    for future in as_completed(futures):
+                        side = futures[future]
+                        is_pwa[side] = future.result()
+                        yield sse_event('detection', {'side': side, 'url': targets[side], 'is_pwa': is_pwa[side]})
+                    selected_crawler = 'pwa' if is_pwa[1] or is_pwa[2] else 'selenium'
+
+                # Crawl both sites in parallel
+                futures = {executor.submit(crawl_pool.extract_content, selected_crawler, target): side
+                           for side, target in targets.items()}
+                contents = {}
+                for future in as_completed(futures):
+                    side = futures[future]
+                    content = future.result()
+                    contents[side] = content
+                    yield sse_event('crawl', {
+                        'side': side,
+                        'ok': bool(content),
+                        'chars': len(content) if content else 0,
+                        'words': len(content.split()) if content else 0
+                    })
+
+            if not contents[1] or not contents[2]:
+                raise RuntimeError("Failed to fetch content from one or both URLs")
+
+            # Local similarity is available long before the LLM answers
+            yield sse_event('similarity', {'score': comparator.similarity.score(contents[1], contents[2])})
+
+            processed_content1 = content_processor.prepare_content(contents[1])
+            processed_content2 = content_processor.prepare_content(contents[2])
+            for kind, data in comparator.compare_contents_stream(processed_content1, processed_content2):
+                if kind == 'delta':
+                    yield sse_event('analysis', {'delta': data})
+                else:
+                    yield sse_event('result', data)
+
+        except Exception as e:
+            yield sse_event('failed', {'message': str(e)})
+
+        yield sse_event('done', {})
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a comparison for the worker nodes and return its job id"""
+    data = request.get_json(silent=True) or request.form
+    url1 = data.get('url1')
+    url2 = data.get('url2')
+    if not url1 or not url2:
+        return jsonify({'error': 'url1 and url2 are required'}), 400
+
+    use_curl = str(data.get('use_curl', '')).lower() in ('1', 'true', 'on')
+    job_id = submit_comparison(job_queue, url1, url2, use_curl=use_curl)
+    return jsonify({'job_id': job_id}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the status of a queued comparison and its result once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+    })
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
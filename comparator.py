@@ -1,9 +1,15 @@
 from openai import OpenAI
 import logging
+from content_processor import ContentProcessor
+from similarity import SimilarityMatrix
 
 class ContentComparator:
-    def __init__(self, api_key):
+    def __init__(self, api_key, content_processor=None):
         self.client = OpenAI(api_key=api_key)
+        # Truncates texts escalated to the LLM by compare_many
+        self.content_processor = content_processor or ContentProcessor(api_key)
+        # Local vector similarity, used to pick pairs worth an LLM call
+        self.similarity = SimilarityMatrix()
 
     def preprocess_text(self, text):
         """Preprocess text for comparison"""
@@ -15,7 +21,41 @@ class ContentComparator:
         text = text.replace('"', '"').replace('"', '"').replace(''', "'").replace(''', "'")
         return text
 
-    def compare_contents(self, text1, text2):
+    def _comparison_messages(self, text1, text2):
+        """Chat messages asking the model for a score and analysis"""
+        return [
+            {"role": "system", "content": """You are a precise content comparison expert. 
+            Follow these rules strictly:
+            1. If the texts are identical or only differ in whitespace, score must be 100
+            2. If the texts contain the same information but slightly different wording, score should be 95-99
+            3. For minor differences, score should be 90-94
+            4. For significant differences, score should be below 90
+            Be very precise in your scoring."""},
+            {"role": "user", "content": f"First provide a similarity score (just the number 0-100) on the first line, then on subsequent lines provide detailed analysis of the key differences:\n\nText 1: {text1}\n\nText 2: {text2}"}
+        ]
+
+    def _parse_result(self, result, text1, text2):
+        """Split the model's reply into score and analysis"""
+        lines = result.split('\n', 1)
+        score = lines[0].strip().rstrip('%')  # Remove % if present
+        analysis = lines[1].strip() if len(lines) > 1 else ""
+        
+        # Double-check the score for very similar content
+        if text1.strip() == text2.strip():
+            score = '100'
+            analysis = 'The contents are exactly identical.'
+        
+        return {
+            'score': score,
+            'analysis': analysis
+        }
+
+    def compare_contents(self, text1, text2, raise_errors=False):
+        """Score and analyze how similar two texts are.
+
+        Errors are returned as a score of 0 unless raise_errors is set, in
+        which case they propagate so queued jobs can be retried.
+        """
         try:
             # Preprocess texts
             processed_text1 = self.preprocess_text(text1)
@@ -30,41 +70,91 @@ class ContentComparator:
 
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": """You are a precise content comparison expert. 
-                    Follow these rules strictly:
-                    1. If the texts are identical or only differ in whitespace, score must be 100
-                    2. If the texts contain the same information but slightly different wording, score should be 95-99
-                    3. For minor differences, score should be 90-94
-                    4. For significant differences, score should be below 90
-                    Be very precise in your scoring."""},
-                    {"role": "user", "content": f"First provide a similarity score (just the number 0-100) on the first line, then on subsequent lines provide detailed analysis of the key differences:\n\nText 1: {text1}\n\nText 2: {text2}"}
-                ],
+                messages=self._comparison_messages(text1, text2),
                 temperature=0.3  # Make the model more deterministic
             )
             
-            result = response.choices[0].message.content
-            lines = result.split('\n', 1)
-            score = lines[0].strip().rstrip('%')  # Remove % if present
-            analysis = lines[1].strip() if len(lines) > 1 else ""
-            
-            # Double-check the score for very similar content
-            if text1.strip() == text2.strip():
-                score = '100'
-                analysis = 'The contents are exactly identical.'
+            return self._parse_result(response.choices[0].message.content, text1, text2)
             
+        except Exception as e:
+            if raise_errors:
+                raise
+            logging.error(f"Error in comparison: {str(e)}")
             return {
-                'score': score,
-                'analysis': analysis
+                'score': '0',
+                'analysis': f"Error in comparison: {str(e)}"
             }
+
+    def compare_contents_stream(self, text1, text2):
+        """Streaming version of compare_contents.
+
+        Yields ('delta', text) for each chunk of the model's reply as it
+        arrives, then ('result', {'score': ..., 'analysis': ...}).
+        """
+        try:
+            # Check for exact match after preprocessing
+            if self.preprocess_text(text1) == self.preprocess_text(text2):
+                yield 'result', {
+                    'score': '100',
+                    'analysis': 'The contents are exactly identical (ignoring case and formatting).'
+                }
+                return
+
+            stream = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._comparison_messages(text1, text2),
+                temperature=0.3,  # Make the model more deterministic
+                stream=True
+            )
+            
+            chunks = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    chunks.append(delta)
+                    yield 'delta', delta
+            
+            yield 'result', self._parse_result(''.join(chunks), text1, text2)
             
         except Exception as e:
             logging.error(f"Error in comparison: {str(e)}")
-            return {
+            yield 'result', {
                 'score': '0',
                 'analysis': f"Error in comparison: {str(e)}"
             }
 
+    def compare_many(self, texts_a, texts_b=None, top_k=5, escalate_k=0):
+        """Compare every text in texts_a against every text in texts_b at once.
+
+        Similarities come from local TF-IDF vectors, not the LLM. Without
+        texts_b, texts_a is compared against itself. The escalate_k most and
+        least similar pairs are additionally analyzed with compare_contents,
+        after truncating both texts with the content processor.
+        """
+        texts_a = list(texts_a)
+        texts_b = None if texts_b is None else list(texts_b)
+        scores = self.similarity.compute(texts_a, texts_b)
+        self_compare = texts_b is None
+        texts_b = texts_a if self_compare else texts_b
+
+        most_similar = self.similarity.top_pairs(scores, k=max(top_k, escalate_k), exclude_diagonal=self_compare)
+        least_similar = self.similarity.top_pairs(scores, k=max(top_k, escalate_k), most_similar=False,
+                                                  exclude_diagonal=self_compare)
+
+        analyses = {}
+        for i, j, _ in most_similar[:escalate_k] + least_similar[:escalate_k]:
+            if (i, j) not in analyses:
+                analyses[(i, j)] = self.compare_contents(
+                    self.content_processor.prepare_content(texts_a[i]),
+                    self.content_processor.prepare_content(texts_b[j]))
+
+        return {
+            'scores': scores,
+            'most_similar': most_similar[:top_k],
+            'least_similar': least_similar[:top_k],
+            'analyses': analyses
+        }
+
 if __name__ == "__main__":
     import os
     from dotenv import load_dotenv
@@ -86,4 +176,11 @@ if __name__ == "__main__":
     
     result = comparator.compare_contents(text1, text2)
     print("\nComparison Result:")
-    print(result) 
\ No newline at end of file
+    print(result)
+    
+    # Compare one reference against several variants without calling the LLM
+    variants = [text2, text1.replace("simplicity", "readability"), "Rust is a systems programming language."]
+    matrix_result = comparator.compare_many([text1], variants, top_k=2)
+    print("\nMatrix Comparison Result:")
+    print(f"Most similar: {matrix_result['most_similar']}")
+    print(f"Least similar: {matrix_result['least_similar']}") 
\ No newline at end of file
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+OFF = 'off'
+RECORD = 'record'      # crawl normally and save everything fetched
+REPLAY = 'replay'      # serve everything from the archive, no network or browser
+
+
+class ArchiveMissError(Exception):
+    """Raised in replay mode when a request was never recorded"""
+
+
+class CrawlArchive:
+    """Compact SQLite archive of HTTP responses, rendered text and detections"""
+
+    def __init__(self, path=None, mode=None):
+        self.path = path or os.getenv('CRAWL_ARCHIVE_PATH', 'crawl_archive.sqlite3')
+        self.mode = (mode or os.getenv('CRAWL_ARCHIVE_MODE', OFF)).lower()
+        if self.mode not in (OFF, RECORD, REPLAY):
+            raise ValueError(f"Unknown crawl archive mode: {self.mode}")
+        self._local = threading.local()
+        if self.mode != OFF:
+            self._create_schema()
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                body BLOB NOT NULL,
+                recorded_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS texts (
+                crawler TEXT NOT NULL,
+                url TEXT NOT NULL,
+                text BLOB NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (crawler, url)
+            );
+            CREATE TABLE IF NOT EXISTS detections (
+                url TEXT PRIMARY KEY,
+                is_pwa INTEGER NOT NULL,
+                recorded_at REAL NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def request_key(method, url, params=None, data=None):
+        """Identify a request by method, URL, query parameters and body"""
+        extra = json.dumps([params or {}, data], sort_keys=True, default=str)
+        return f"{method.upper()} {url} {hashlib.sha1(extra.encode()).hexdigest()}"
+
+    def _write(self, sql, params, what):
+        """Recording is best effort: a failed write is logged, never raised into the crawl"""
+        try:
+            with self._connect() as conn:
+                conn.execute(sql, params)
+        except Exception as e:
+            logging.error(f"Error recording {what}: {str(e)}")
+
+    def put_response(self, method, url, response, params=None, data=None):
+        self._write(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.request_key(method, url, params, data), method.upper(), url, response.status_code,
+             json.dumps(dict(response.headers)), response.encoding,
+             zlib.compress(response.content), time.time()),
+            f"response for {url}")
+
+    def get_response(self, method, url, params=None, data=None):
+        """Rebuild a recorded requests.Response"""
+        row = self._connect().execute(
+            "SELECT status, headers, encoding, body FROM responses WHERE key = ?",
+            (self.request_key(method, url, params, data),)).fetchone()
+        if row is None:
+            raise ArchiveMissError(f"No recorded response for {method.upper()} {url}")
+
+        status, headers, encoding, body = row
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = zlib.decompress(body)
+        return response
+
+    def put_text(self, crawler_name, url, text):
+        self._write(
+            "INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?)",
+            (crawler_name, url, zlib.compress(text.encode('utf-8')), time.time()),
+            f"{crawler_name} text for {url}")
+
+    def get_text(self, crawler_name, url):
+        """Return recorded rendered text, or None if it was never recorded"""
+        row = self._connect().execute(
+            "SELECT text FROM texts WHERE crawler = ? AND url = ?", (crawler_name, url)).fetchone()
+        if row is None:
+            logging.warning(f"No recorded {crawler_name} text for {url}")
+            return None
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put_detection(self, url, is_pwa):
+        self._write(
+            "INSERT OR REPLACE INTO detections VALUES (?, ?, ?)", (url, int(bool(is_pwa)), time.time()),
+            f"detection for {url}")
+
+    def get_detection(self, url):
+        """Return the recorded PWA/React verdict, or None if never recorded"""
+        row = self._connect().execute("SELECT is_pwa FROM detections WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            logging.warning(f"No recorded PWA/React detection for {url}")
+            return None
+        return bool(row[0])
+
+
+_default_archive = None
+_default_lock = threading.Lock()
+
+
+def get_crawl_archive():
+    """Return the process-wide archive configured by CRAWL_ARCHIVE_MODE/PATH"""
+    global _default_archive
+    with _default_lock:
+        if _default_archive is None:
+            _default_archive = CrawlArchive()
+        return _default_archive
+
+
+if __name__ == "__main__":
+    # Example usage of CrawlArchive: record a crawl, then replay it offline
+    from crawler_pwa import PWAWebCrawler
+    from fetch_controller import FetchController
+
+    test_url = "https://example.com"
+    path = 'example_archive.sqlite3'
+
+    print("Testing CrawlArchive...")
+    for mode in (RECORD, REPLAY):
+        archive = CrawlArchive(path=path, mode=mode)
+        crawler = PWAWebCrawler(fetch_controller=FetchController(archive=archive), archive=archive)
+        content = crawler.extract_content(test_url)
+        print(f"\n{mode}: {content[:200] if content else 'Failed to extract content'}")
@@ -0,0 +1,349 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.connection import wait as wait_for_connections
+
+import psutil
+
+from fetch_controller import PipeHostLimiter, get_fetch_controller, set_default_limiter
+
+# Crawlers that can run inside a worker, keyed by the name used in jobs
+CRAWLERS = {
+    'selenium': ('crawler', 'WebCrawler'),
+    'pwa': ('crawler_pwa', 'PWAWebCrawler'),
+    'curl': ('curl_crawler', 'CurlCrawler'),
+}
+
+
+def _worker_main(conn, limiter_conn):
+    """Worker process loop: run crawl jobs received over the pipe"""
+    # Own process group so Chrome and chromedriver die with the worker
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Per-host fetch limits are kept by the parent and shared by all workers
+    set_default_limiter(PipeHostLimiter(limiter_conn))
+
+    crawlers = {}
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        crawler_name, method, args, kwargs = job
+        try:
+            if crawler_name not in crawlers:
+                module_name, class_name = CRAWLERS[crawler_name]
+                module = __import__(module_name)
+                crawlers[crawler_name] = getattr(module, class_name)()
+            result = getattr(crawlers[crawler_name], method)(*args, **kwargs)
+            conn.send(('ok', result))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+
+
+class _Worker:
+    """Handle on one worker process and the parent ends of its pipes"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.limiter_conn, child_limiter_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, child_limiter_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        child_limiter_conn.close()
+        self.jobs_done = 0
+        # (host, probe) fetch slots the worker holds, released if it is killed
+        self.held_slots = []
+        self.limiter_closed = False
+        # Set once the pool has taken back the worker's slots
+        self.retired = False
+
+    def rss_bytes(self):
+        """Resident memory of the worker and everything it spawned (Chrome)"""
+        try:
+            proc = psutil.Process(self.process.pid)
+            total = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except psutil.Error:
+            return 0
+
+    def stop(self, timeout=5):
+        """Ask the worker to exit, killing its process group if it does not"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+
+    def close(self):
+        self.conn.close()
+        self.limiter_conn.close()
+
+    def kill(self):
+        """Kill the worker together with any browser processes it started"""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            self.process.kill()
+        self.process.join(1)
+
+
+class CrawlWorkerPool:
+    """Supervised pool of crawler processes with memory and time limits"""
+
+    def __init__(self, size=None, max_rss_mb=None, job_timeout=None,
+                 max_jobs_per_worker=None, queue_timeout=None, limiter=None, poll_interval=0.5):
+        self.size = size or int(os.getenv('CRAWL_POOL_SIZE', '2'))
+        self.max_rss_bytes = (max_rss_mb or int(os.getenv('CRAWL_MAX_RSS_MB', '1024'))) * 1024 * 1024
+        self.job_timeout = job_timeout or float(os.getenv('CRAWL_JOB_TIMEOUT', '90'))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv('CRAWL_MAX_JOBS_PER_WORKER', '20'))
+        # How long a job may wait for a free worker before it is rejected
+        self.queue_timeout = queue_timeout or float(os.getenv('CRAWL_QUEUE_TIMEOUT', '30'))
+        self.poll_interval = poll_interval
+        # Host limits served to every worker; defaults to this process's controller
+        self.limiter = limiter
+
+        # Spawn rather than fork: the parent is a threaded Flask process
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        # Workers handed over by run() to be retired and respawned in the background
+        self._retiring = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    def _start(self):
+        """Start the workers on first use so importing the pool is cheap"""
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                worker = _Worker(self._context)
+                self._workers.add(worker)
+                self._idle.put(worker)
+            self.limiter = self.limiter or get_fetch_controller().limiter
+            threading.Thread(target=self._serve_limits, daemon=True).start()
+            threading.Thread(target=self._recycle_workers, daemon=True).start()
+            self._started = True
+            atexit.register(self.shutdown)
+
+    def _serve_limits(self):
+        """Answer fetch slot requests from the workers' PipeHostLimiters"""
+        while not self._closed:
+            with self._lock:
+                workers = {w.limiter_conn: w for w in self._workers if not w.limiter_closed}
+            try:
+                ready = wait_for_connections(list(workers), timeout=self.poll_interval)
+            except (OSError, ValueError):
+                # A connection was closed by a worker being replaced
+                continue
+
+            for conn in ready:
+                with self._lock:
+                    self._serve_message(workers[conn])
+
+    def _serve_message(self, worker):
+        """Answer one message from a worker's limiter pipe. Call with self._lock held."""
+        try:
+            message = worker.limiter_conn.recv()
+        except (EOFError, OSError):
+            worker.limiter_closed = True
+            return
+
+        if message[0] == 'release':
+            # Only release slots the pool still counts as held by this worker
+            slot = (message[1], message[4])
+            if slot in worker.held_slots:
+                worker.held_slots.remove(slot)
+                self.limiter.handle(message)
+            return
+        if worker.retired:
+            # Never grant a slot to a worker that is being replaced
+            return
+
+        reply = self.limiter.handle(message)
+        if reply[0] == 'wait' and not reply[1]:
+            worker.held_slots.append((message[1], reply[2]))
+        try:
+            worker.limiter_conn.send(reply)
+        except OSError:
+            worker.limiter_closed = True
+
+    def _release_slots(self, worker, failed):
+        """Take back the fetch slots of a stopped or killed worker"""
+        with self._lock:
+            worker.retired = True
+            # Apply releases the worker sent before it exited
+            while not worker.limiter_closed and worker.limiter_conn.poll():
+                self._serve_message(worker)
+            held, worker.held_slots = worker.held_slots, []
+            for host, probe in held:
+                self.limiter.release(host, 0.0, failed, probe)
+
+    def _replace(self, worker, kill=False):
+        """Retire a worker and put a fresh one in its place"""
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        self._release_slots(worker, failed=kill)
+        worker.close()
+        if self._closed:
+            # Shutting down: leave the retired worker in place of a fresh one
+            return worker
+        replacement = _Worker(self._context)
+        with self._lock:
+            self._workers.discard(worker)
+            self._workers.add(replacement)
+        return replacement
+
+    def _recycle_workers(self):
+        """Replace retired workers off the request path and return them to the idle queue"""
+        while True:
+            worker, kill = self._retiring.get()
+            try:
+                worker = self._replace(worker, kill=kill)
+            except Exception as e:
+                # Hand back the old worker; run() replaces dead workers it is given
+                logging.error(f"Failed to replace crawl worker: {str(e)}")
+            self._idle.put(worker)
+
+    def run(self, crawler_name, method, *args, **kwargs):
+        """Run crawler_name.method(*args, **kwargs) in a worker process.
+
+        Returns the method's result, or None if no worker became free
+        within the queue timeout, or the job failed, exceeded the
+        wall-clock limit or pushed the worker over its memory limit.
+        """
+        if self._closed:
+            raise RuntimeError("Crawl worker pool has been shut down")
+        if crawler_name not in CRAWLERS:
+            raise ValueError(f"Unknown crawler: {crawler_name}")
+        self._start()
+
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            logging.error(f"No crawl worker free within {self.queue_timeout}s for {crawler_name}.{method}{args}")
+            return None
+        # None returns the worker to the idle queue; True or False retires it
+        # in the background (killing it if True) so the caller never waits on a respawn
+        retire = None
+        try:
+            if not worker.process.is_alive():
+                worker = self._replace(worker, kill=True)
+
+            try:
+                worker.conn.send((crawler_name, method, args, kwargs))
+            except (BrokenPipeError, OSError):
+                logging.error(f"Crawl worker died before running {crawler_name}.{method}{args}")
+                retire = True
+                return None
+            deadline = time.monotonic() + self.job_timeout
+            while not worker.conn.poll(self.poll_interval):
+                if not worker.process.is_alive():
+                    logging.error(f"Crawl worker died running {crawler_name}.{method}{args}")
+                    retire = True
+                    return None
+                if time.monotonic() > deadline:
+                    logging.error(f"Crawl job {crawler_name}.{method}{args} exceeded {self.job_timeout}s, killing worker")
+                    retire = True
+                    return None
+                rss = worker.rss_bytes()
+                if rss > self.max_rss_bytes:
+                    logging.error(f"Crawl worker exceeded memory limit ({rss // (1024 * 1024)} MB), killing worker")
+                    retire = True
+                    return None
+
+            try:
+                status, result = worker.conn.recv()
+            except (EOFError, OSError):
+                logging.error(f"Crawl worker died running {crawler_name}.{method}{args}")
+                retire = True
+                return None
+
+            worker.jobs_done += 1
+            if worker.jobs_done >= self.max_jobs_per_worker or worker.rss_bytes() > self.max_rss_bytes:
+                retire = False
+
+            if status == 'error':
+                logging.error(f"Crawl job {crawler_name}.{method}{args} failed: {result}")
+                return None
+            return result
+
+        finally:
+            if retire is None:
+                self._idle.put(worker)
+            else:
+                self._retiring.put((worker, retire))
+
+    def extract_content(self, crawler_name, url_or_curl, **kwargs):
+        """Extract content with the named crawler in a worker process"""
+        return self.run(crawler_name, 'extract_content', url_or_curl, **kwargs)
+
+    def is_pwa_or_react(self, url):
+        """Run PWA/React detection in a worker process"""
+        return bool(self.run('pwa', 'is_pwa_or_react', url))
+
+    def shutdown(self, timeout=5):
+        """Stop all workers, killing any still busy after timeout seconds"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._started:
+                return
+
+        deadline = time.monotonic() + timeout
+        stopped = set()
+        while len(stopped) < self.size:
+            try:
+                worker = self._idle.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            worker.stop()
+            worker.close()
+            stopped.add(worker)
+
+        with self._lock:
+            busy = self._workers - stopped
+        for worker in busy:
+            logging.warning(f"Killing busy crawl worker {worker.process.pid} at shutdown")
+            worker.kill()
+
+
+if __name__ == "__main__":
+    # Example usage of CrawlWorkerPool
+    pool = CrawlWorkerPool(size=2, job_timeout=60)
+
+    test_urls = [
+        "https://example.com",
+        "https://python.org",
+    ]
+
+    print("Testing CrawlWorkerPool...")
+    for url in test_urls:
+        print(f"\nCrawling {url}:")
+        content = pool.extract_content('pwa', url)
+        if content:
+            print(f"Successfully extracted content (first 200 chars):\n{content[:200]}...")
+        else:
+            print(f"Failed to extract content from {url}")
+
+    pool.shutdown()
@@ -9,9 +9,16 @@ from urllib.parse import urlparse
 import time
 from webdriver_manager.chrome import ChromeDriverManager
 import os
+from fetch_controller import get_fetch_controller
+from crawl_archive import get_crawl_archive
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, fetch_controller=None, archive=None):
+        # Shared per-host politeness and concurrency limits
+        self.fetch_controller = fetch_controller or get_fetch_controller()
+        # Record rendered text to, or replay it from, the crawl archive
+        self.archive = archive or get_crawl_archive()
+
         # Set up Chrome options
         self.chrome_options = Options()
         self.chrome_options.add_argument('--headless')  # Run in headless mode
@@ -31,6 +38,9 @@ class WebCrawler:
             if not urlparse(url).scheme:
                 raise ValueError("Invalid URL format")
 
+            if self.archive.replaying:
+                return self.archive.get_text('selenium', url)
+
             # Initialize webdriver
             service = Service(ChromeDriverManager().install())
             driver = webdriver.Chrome(service=service, options=self.chrome_options)
@@ -39,7 +49,8 @@ class WebCrawler:
             driver.set_page_load_timeout(wait_time)
             
             # Navigate to URL
-            driver.get(url)
+            with self.fetch_controller.slot(url):
+                driver.get(url)
             
             # Wait for React to render content
             time.sleep(3)  # Basic wait for React rendering
@@ -82,6 +93,9 @@ class WebCrawler:
             # Clean the text
             text_content = ' '.join(text_content.split())
             
+            if self.archive.recording:
+                self.archive.put_text('selenium', url, text_content)
+            
             return text_content
 
         except Exception as e:
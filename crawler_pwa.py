@@ -11,11 +11,17 @@ import time
 from webdriver_manager.chrome import ChromeDriverManager
 import re
 from bs4 import BeautifulSoup
-import requests
 import os
+from fetch_controller import get_fetch_controller
+from crawl_archive import get_crawl_archive
 
 class PWAWebCrawler:
-    def __init__(self):
+    def __init__(self, fetch_controller=None, archive=None):
+        # Shared per-host politeness and concurrency limits
+        self.fetch_controller = fetch_controller or get_fetch_controller()
+        # Record detections and rendered text to, or replay them from, the crawl archive
+        self.archive = archive or get_crawl_archive()
+
         # Set up Chrome options
         self.chrome_options = Options()
         self.chrome_options.add_argument('--headless')  # Run in headless mode
@@ -28,74 +34,87 @@ class PWAWebCrawler:
         self.user_agent = os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
         self.chrome_options.add_argument(f'user-agent={self.user_agent}')
 
-    def is_pwa_or_react(self, url):
+    def is_pwa_or_react(self, url, timeout=10):
         """Detect if the website is a PWA or React application"""
+        if self.archive.replaying:
+            is_pwa = self.archive.get_detection(url)
+            if is_pwa is not None:
+                return is_pwa
+            # Not recorded: fall through and detect from the archived response
+
         try:
             # Use the same user agent in requests
-            response = requests.get(url, headers={'User-Agent': self.user_agent})
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Check for PWA indicators
-            pwa_indicators = [
-                # Manifest file
-                bool(soup.find('link', {'rel': 'manifest'})),
-                # Service worker registration
-                'serviceWorker' in response.text,
-                # App-specific meta tags
-                bool(soup.find('meta', {'name': 'apple-mobile-web-app-capable'})),
-                bool(soup.find('meta', {'name': 'application-name'}))
-            ]
-            
-            # Check for React indicators
-            react_indicators = [
-                # React-specific attributes
-                bool(soup.find(attrs={'data-reactroot': True})),
-                bool(soup.find(attrs={'data-reactid': True})),
-                # Common React patterns
-                'react' in response.text.lower(),
-                '_reactRootContainer' in response.text,
-                '__REACT_DEVTOOLS_GLOBAL_HOOK__' in response.text
-            ]
-            
-            # If any PWA indicators are present
-            is_pwa = any(pwa_indicators)
-            # If any React indicators are present
-            is_react = any(react_indicators)
-            
-            return is_pwa or is_react
-            
+            response = self.fetch_controller.get(url, headers={'User-Agent': self.user_agent}, timeout=timeout)
+            return self._detect(url, response)
         except Exception as e:
             logging.warning(f"Error detecting PWA/React for {url}: {str(e)}")
             return False
 
+    def _detect(self, url, response):
+        """Check a fetched page for PWA and React indicators"""
+        soup = BeautifulSoup(response.text, 'html.parser')
+        
+        # Check for PWA indicators
+        pwa_indicators = [
+            # Manifest file
+            bool(soup.find('link', {'rel': 'manifest'})),
+            # Service worker registration
+            'serviceWorker' in response.text,
+            # App-specific meta tags
+            bool(soup.find('meta', {'name': 'apple-mobile-web-app-capable'})),
+            bool(soup.find('meta', {'name': 'application-name'}))
+        ]
+        
+        # Check for React indicators
+        react_indicators = [
+            # React-specific attributes
+            bool(soup.find(attrs={'data-reactroot': True})),
+            bool(soup.find(attrs={'data-reactid': True})),
+            # Common React patterns
+            'react' in response.text.lower(),
+            '_reactRootContainer' in response.text,
+            '__REACT_DEVTOOLS_GLOBAL_HOOK__' in response.text
+        ]
+        
+        # If any PWA indicators are present
+        is_pwa = any(pwa_indicators)
+        # If any React indicators are present
+        is_react = any(react_indicators)
+        
+        if self.archive.recording:
+            self.archive.put_detection(url, is_pwa or is_react)
+        
+        return is_pwa or is_react
+
     def extract_content(self, url, wait_time=10, scroll=False, max_retries=3):
         """Modified extract_content method with retries"""
-        # First check if it's a PWA/React site
-        is_dynamic = self.is_pwa_or_react(url)
+        # Fetch the page once, both to check if it's a PWA/React site and, if
+        # not, for its text; the fetch controller retries with exponential backoff
+        try:
+            response = self.fetch_controller.get(
+                url,
+                headers={'User-Agent': self.user_agent},
+                timeout=wait_time,
+                max_attempts=max_retries
+            )
+        except Exception as e:
+            logging.error(f"Error crawling {url} after {max_retries} attempts: {str(e)}")
+            return None
         
-        if not is_dynamic:
-            # If it's not a PWA/React site, use simple requests with retries
-            for attempt in range(max_retries):
-                try:
-                    response = requests.get(
-                        url, 
-                        headers={'User-Agent': self.chrome_options.arguments[-1].split('=')[1]},
-                        timeout=wait_time
-                    )
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    # Get text content
-                    text = soup.get_text(separator=' ', strip=True)
-                    return ' '.join(text.split())
-                except Exception as e:
-                    if attempt == max_retries - 1:  # Last attempt
-                        logging.error(f"Error crawling static site {url} after {max_retries} attempts: {str(e)}")
-                        return None
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    continue
+        if not self._detect(url, response):
+            # If it's not a PWA/React site, use the fetched page
+            try:
+                response.raise_for_status()
+                soup = BeautifulSoup(response.text, 'html.parser')
+                # Remove script and style elements
+                for script in soup(["script", "style"]):
+                    script.decompose()
+                # Get text content
+                text = soup.get_text(separator=' ', strip=True)
+                return ' '.join(text.split())
+            except Exception as e:
+                logging.error(f"Error crawling static site {url}: {str(e)}")
+                return None
 
         # If it is a PWA/React site, use Selenium
         driver = None
@@ -104,6 +123,9 @@ class PWAWebCrawler:
             if not urlparse(url).scheme:
                 raise ValueError("Invalid URL format")
 
+            if self.archive.replaying:
+                return self.archive.get_text('pwa', url)
+
             # Initialize webdriver
             service = Service(ChromeDriverManager().install())
             driver = webdriver.Chrome(service=service, options=self.chrome_options)
@@ -112,7 +134,8 @@ class PWAWebCrawler:
             driver.set_page_load_timeout(wait_time)
             
             # Navigate to URL
-            driver.get(url)
+            with self.fetch_controller.slot(url):
+                driver.get(url)
             
             # Wait for React to render content
             time.sleep(3)  # Basic wait for React rendering
@@ -156,6 +179,9 @@ class PWAWebCrawler:
             # Clean the text
             text_content = ' '.join(text_content.split())
             
+            if self.archive.recording:
+                self.archive.put_text('pwa', url, text_content)
+            
             return text_content
 
         except Exception as e:
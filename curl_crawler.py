@@ -6,10 +6,14 @@ import shlex
 import re
 from bs4 import BeautifulSoup
 import os
+from fetch_controller import get_fetch_controller
 
 class CurlCrawler:
-    def __init__(self):
+    def __init__(self, fetch_controller=None, timeout=10):
         self.session = requests.Session()
+        self.timeout = timeout
+        # Shared per-host politeness and concurrency limits
+        self.fetch_controller = fetch_controller or get_fetch_controller()
         # Get user agent from environment variables
         self.user_agent = os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
     
@@ -87,13 +91,15 @@ class CurlCrawler:
             if not req_params:
                 return None
 
-            # Make the request
-            response = self.session.request(
-                method=req_params['method'],
-                url=req_params['url'],
+            # Make the request, with retries and per-host limits
+            response = self.fetch_controller.request(
+                req_params['method'],
+                req_params['url'],
+                session=self.session,
                 headers=req_params['headers'],
                 data=req_params['data'],
-                params=req_params['params']
+                params=req_params['params'],
+                timeout=self.timeout
             )
             response.raise_for_status()
 
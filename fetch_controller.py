@@ -0,0 +1,297 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+from crawl_archive import get_crawl_archive
+
+# Status codes that mean the host is struggling; they count as errors and are retried
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a host's circuit breaker is open"""
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} from {response.url}")
+        self.response = response
+
+
+class HostState:
+    """Concurrency, rate and health bookkeeping for a single host"""
+
+    def __init__(self, initial_limit):
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+
+class HostLimiter:
+    """Per-host politeness and adaptive concurrency.
+
+    Each host gets a concurrency limit adjusted with AIMD (additive increase
+    while requests are fast and succeed, multiplicative decrease on slow or
+    failed ones), a minimum interval between request starts, and a circuit
+    breaker that rejects requests for a cooldown period after repeated
+    failures.
+    """
+
+    def __init__(self, max_concurrency=None, min_concurrency=1, requests_per_second=None,
+                 latency_target=None, error_threshold=0.5, breaker_failures=None,
+                 breaker_cooldown=None):
+        self.max_concurrency = max_concurrency or int(os.getenv('FETCH_MAX_CONCURRENCY_PER_HOST', '4'))
+        self.min_concurrency = min_concurrency
+        rate = requests_per_second or float(os.getenv('FETCH_REQUESTS_PER_SECOND', '2'))
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self.latency_target = latency_target or float(os.getenv('FETCH_LATENCY_TARGET', '5'))
+        self.error_threshold = error_threshold
+        self.breaker_failures = breaker_failures or int(os.getenv('FETCH_BREAKER_FAILURES', '5'))
+        self.breaker_cooldown = breaker_cooldown or float(os.getenv('FETCH_BREAKER_COOLDOWN', '30'))
+
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    def _host_state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = HostState(self.min_concurrency)
+        return self._hosts[host]
+
+    def _try_acquire(self, host):
+        """Reserve a slot for host. Returns (seconds to wait, probe), waiting 0 on success."""
+        state = self._host_state(host)
+        now = time.monotonic()
+
+        half_open = False
+        if state.opened_at is not None:
+            if now - state.opened_at < self.breaker_cooldown or state.probe_in_flight:
+                raise CircuitOpenError(f"Circuit open for {host}")
+            # Cooldown elapsed: let a single probe request through
+            half_open = True
+
+        if state.in_flight >= max(self.min_concurrency, int(state.limit)):
+            return self.min_interval or 0.1, False
+        if now < state.next_start:
+            return state.next_start - now, False
+
+        state.in_flight += 1
+        state.next_start = now + self.min_interval
+        if half_open:
+            state.probe_in_flight = True
+        return 0, half_open
+
+    def try_acquire(self, host):
+        """Reserve a slot for host without waiting.
+
+        Returns (seconds to wait, probe). On success the wait is 0 and probe
+        says whether the slot is the half-open breaker probe; pass it back to
+        release().
+        """
+        with self._cond:
+            return self._try_acquire(host)
+
+    def acquire(self, host):
+        """Wait for a slot for host and return its probe flag.
+
+        Raises CircuitOpenError if the host's breaker is open.
+        """
+        with self._cond:
+            while True:
+                wait, probe = self._try_acquire(host)
+                if not wait:
+                    return probe
+                self._cond.wait(wait)
+
+    def release(self, host, latency, failed, probe=False):
+        """Free a slot and feed the outcome into AIMD and the circuit breaker"""
+        with self._cond:
+            state = self._host_state(host)
+            state.in_flight -= 1
+            if probe:
+                # Only the probe itself ends the half-open state, not a request
+                # that started before the breaker opened
+                state.probe_in_flight = False
+
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            state.error_rate = 0.8 * state.error_rate + 0.2 * (1.0 if failed else 0.0)
+
+            if failed or latency > self.latency_target or state.error_rate > self.error_threshold:
+                state.limit = max(self.min_concurrency, state.limit / 2)
+            else:
+                state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+
+            if failed:
+                state.consecutive_failures += 1
+                if state.opened_at is not None or state.consecutive_failures >= self.breaker_failures:
+                    if state.opened_at is None:
+                        logging.warning(f"Opening circuit for {host} after {state.consecutive_failures} failures")
+                    state.opened_at = time.monotonic()
+            elif probe or state.opened_at is None:
+                state.consecutive_failures = 0
+                state.opened_at = None
+            self._cond.notify_all()
+
+    def handle(self, message):
+        """Serve a request from a PipeHostLimiter. Returns the reply, if any."""
+        if message[0] == 'acquire':
+            try:
+                return ('wait',) + self.try_acquire(message[1])
+            except CircuitOpenError as e:
+                return 'open', str(e)
+        if message[0] == 'release':
+            self.release(*message[1:])
+        return None
+
+
+class PipeHostLimiter:
+    """HostLimiter stand-in for crawl worker processes.
+
+    Slot requests go over a pipe to the HostLimiter in the CrawlWorkerPool
+    parent, so every worker in the pool shares one set of host limits.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def try_acquire(self, host):
+        with self._lock:
+            self.conn.send(('acquire', host))
+            reply = self.conn.recv()
+        if reply[0] == 'open':
+            raise CircuitOpenError(reply[1])
+        return reply[1:]
+
+    def acquire(self, host):
+        while True:
+            wait, probe = self.try_acquire(host)
+            if not wait:
+                return probe
+            time.sleep(wait)
+
+    def release(self, host, latency, failed, probe=False):
+        with self._lock:
+            self.conn.send(('release', host, latency, failed, probe))
+
+
+class FetchController:
+    """Retrying HTTP fetches that respect per-host limits, shared by all fetchers.
+
+    Host limits come from a HostLimiter. Inside CrawlWorkerPool workers this
+    is a PipeHostLimiter, so the limits hold across the whole pool. Across
+    worker nodes, the job queue's per-domain lease limit caps concurrency.
+    """
+
+    def __init__(self, limiter=None, max_attempts=None, backoff_base=1.0, archive=None, **limiter_options):
+        self.limiter = limiter or HostLimiter(**limiter_options)
+        self.max_attempts = max_attempts or int(os.getenv('FETCH_MAX_ATTEMPTS', '3'))
+        self.backoff_base = backoff_base
+        # Record responses to, or replay them from, the crawl archive
+        self.archive = archive or get_crawl_archive()
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a request slot for url's host for the duration of the block.
+
+        An exception raised inside the block counts as a failure. Raises
+        CircuitOpenError if the host's breaker is open.
+        """
+        host = urlparse(url).netloc.lower()
+        probe = self.limiter.acquire(host)
+
+        start = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.limiter.release(host, time.monotonic() - start, failed, probe)
+
+    def _backoff(self, attempt):
+        return self.backoff_base * 2 ** (attempt - 1)
+
+    def request(self, method, url, session=None, max_attempts=None, **kwargs):
+        """Perform an HTTP request with retries and return the response.
+
+        The backoff between attempts blocks the calling thread, so a retried
+        fetch holds its crawl worker, and whoever waits on the worker's
+        result, for the whole backoff. Returns the last response, even if it
+        has a retryable status, or raises the last exception.
+        """
+        session = session or requests
+        max_attempts = max_attempts or self.max_attempts
+
+        if self.archive.replaying:
+            return self.archive.get_response(method, url, kwargs.get('params'), kwargs.get('data'))
+
+        for number in range(1, max_attempts + 1):
+            try:
+                with self.slot(url):
+                    response = session.request(method, url, **kwargs)
+                    if response.status_code in RETRYABLE_STATUS:
+                        raise RetryableStatusError(response)
+                break
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if number >= max_attempts:
+                    if isinstance(e, RetryableStatusError):
+                        response = e.response
+                        break
+                    raise
+                logging.warning(f"Attempt {number} for {url} failed ({str(e)}), retrying")
+                time.sleep(self._backoff(number))
+
+        # Outside the retry loop: an archive failure must not count as a failed fetch
+        if self.archive.recording:
+            self.archive.put_response(method, url, response, kwargs.get('params'), kwargs.get('data'))
+        return response
+
+    def get(self, url, session=None, max_attempts=None, **kwargs):
+        return self.request('GET', url, session=session, max_attempts=max_attempts, **kwargs)
+
+
+_default_controller = None
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def set_default_limiter(limiter):
+    """Use limiter for the process-wide controller; call before get_fetch_controller()"""
+    global _default_limiter
+    with _default_lock:
+        _default_limiter = limiter
+
+
+def get_fetch_controller():
+    """Return the process-wide controller shared by all crawlers"""
+    global _default_controller
+    with _default_lock:
+        if _default_controller is None:
+            _default_controller = FetchController(limiter=_default_limiter)
+        return _default_controller
+
+
+if __name__ == "__main__":
+    # Example usage of FetchController
+    controller = get_fetch_controller()
+
+    print("Testing FetchController...")
+    for _ in range(5):
+        try:
+            print(f"Status: {controller.get('https://example.com', timeout=10).status_code}")
+        except Exception as e:
+            print(f"Failed: {str(e)}")
+
+    state = controller.limiter._hosts['example.com']
+    print(f"\nexample.com concurrency limit: {state.limit:.2f}, latency: {state.latency:.2f}s")
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+# Job states
+BLOCKED = 'blocked'    # waiting for the jobs it depends on
+QUEUED = 'queued'      # ready to be leased
+LEASED = 'leased'      # held by a worker until its lease expires
+DONE = 'done'
+DEAD = 'dead'          # failed max_attempts times, or a dependency died
+
+
+def domain_of(url_or_curl):
+    """Host a crawl job will hit, used for per-domain concurrency limits"""
+    for part in url_or_curl.replace('"', ' ').replace("'", ' ').split():
+        host = urlparse(part).netloc
+        if host:
+            return host.lower()
+    return None
+
+
+class JobQueue(ABC):
+    """Interface every queue backend implements.
+
+    A job is a dict with id, stage, payload, domain, status, attempts,
+    max_attempts, depends_on, result and error. Jobs that depend on others
+    stay blocked until all of them are done; their results are then
+    available through get().
+    """
+
+    lease_seconds = 120
+
+    @abstractmethod
+    def enqueue(self, stage, payload, domain=None, depends_on=None, max_attempts=3):
+        """Add a job and return its id"""
+
+    @abstractmethod
+    def lease(self, worker_id, stages=None, lease_seconds=None):
+        """Claim the next runnable job for worker_id, or return None"""
+
+    @abstractmethod
+    def extend_lease(self, job_id, worker_id, lease_seconds=None):
+        """Push back the visibility timeout of a job the worker still holds"""
+
+    @abstractmethod
+    def complete(self, job_id, worker_id, result):
+        """Store a job's result and unblock jobs waiting on it"""
+
+    @abstractmethod
+    def fail(self, job_id, worker_id, error, retry_delay=None):
+        """Record a failed attempt, requeueing the job if attempts remain"""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Return the job dict, or None if it does not exist"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Durable job queue in a local SQLite file, shareable across processes"""
+
+    def __init__(self, path=None, lease_seconds=None, domain_concurrency=None, retry_delay=None):
+        self.path = path or os.getenv('JOB_QUEUE_PATH', 'jobs.sqlite3')
+        self.lease_seconds = lease_seconds or float(os.getenv('JOB_LEASE_SECONDS', '120'))
+        # Maximum leased jobs per domain across all workers
+        self.domain_concurrency = domain_concurrency or int(os.getenv('JOB_DOMAIN_CONCURRENCY', '2'))
+        self.retry_delay = retry_delay or float(os.getenv('JOB_RETRY_DELAY', '10'))
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connect(self):
+        """One connection per thread; writes take the database lock up front"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                domain TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                depends_on TEXT NOT NULL DEFAULT '[]',
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, available_at);
+            CREATE INDEX IF NOT EXISTS jobs_domain ON jobs (domain, status);
+            CREATE TABLE IF NOT EXISTS job_deps (
+                job_id TEXT NOT NULL,
+                depends_on TEXT NOT NULL,
+                PRIMARY KEY (job_id, depends_on)
+            );
+            CREATE INDEX IF NOT EXISTS job_deps_depends_on ON job_deps (depends_on);
+        """)
+
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def _row_to_job(self, row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['depends_on'] = json.loads(job['depends_on'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def enqueue(self, stage, payload, domain=None, depends_on=None, max_attempts=3):
+        job_id = uuid.uuid4().hex
+        depends_on = list(depends_on or [])
+        now = time.time()
+        conn = self._transaction()
+        try:
+            status = QUEUED
+            if depends_on:
+                placeholders = ','.join('?' * len(depends_on))
+                statuses = [row['status'] for row in conn.execute(
+                    f"SELECT status FROM jobs WHERE id IN ({placeholders})", depends_on)]
+                if DEAD in statuses:
+                    status = DEAD
+                elif len(statuses) < len(depends_on) or any(s != DONE for s in statuses):
+                    status = BLOCKED
+            conn.execute(
+                """INSERT INTO jobs (id, stage, payload, domain, status, max_attempts, depends_on,
+                                     available_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, stage, json.dumps(payload), domain, status, max_attempts,
+                 json.dumps(depends_on), now, now, now))
+            conn.executemany(
+                "INSERT OR IGNORE INTO job_deps (job_id, depends_on) VALUES (?, ?)",
+                [(job_id, dependency) for dependency in depends_on])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return job_id
+
+    def lease(self, worker_id, stages=None, lease_seconds=None):
+        lease_seconds = lease_seconds or self.lease_seconds
+        now = time.time()
+        conn = self._transaction()
+        try:
+            # Expired leases become visible again
+            conn.execute(
+                """UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL,
+                                   error = 'lease expired', updated_at = ?
+                   WHERE status = ? AND lease_expires < ?""",
+                (QUEUED, now, LEASED, now))
+            exhausted = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND attempts >= max_attempts", (QUEUED,))]
+            for job_id in exhausted:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = 'lease expired too many times', updated_at = ? WHERE id = ?",
+                    (DEAD, now, job_id))
+                self._cascade_dead(conn, job_id, now)
+
+            query = """SELECT * FROM jobs AS j
+                       WHERE status = ? AND available_at <= ?
+                         AND (domain IS NULL OR
+                              (SELECT COUNT(*) FROM jobs AS l
+                               WHERE l.domain = j.domain AND l.status = ?) < ?)"""
+            params = [QUEUED, now, LEASED, self.domain_concurrency]
+            if stages:
+                query += f" AND stage IN ({','.join('?' * len(stages))})"
+                params.extend(stages)
+            query += " ORDER BY available_at, created_at LIMIT 1"
+            row = conn.execute(query, params).fetchone()
+
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                """UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?,
+                                   attempts = attempts + 1, updated_at = ?
+                   WHERE id = ?""",
+                (LEASED, worker_id, now + lease_seconds, now, row['id']))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id'])
+
+    def extend_lease(self, job_id, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or self.lease_seconds
+        now = time.time()
+        cursor = self._connect().execute(
+            """UPDATE jobs SET lease_expires = ?, updated_at = ?
+               WHERE id = ? AND status = ? AND lease_owner = ?""",
+            (now + lease_seconds, now, job_id, LEASED, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        now = time.time()
+        conn = self._transaction()
+        try:
+            cursor = conn.execute(
+                """UPDATE jobs SET status = ?, result = ?, error = NULL, lease_owner = NULL,
+                                   lease_expires = NULL, updated_at = ?
+                   WHERE id = ? AND status = ? AND lease_owner = ?""",
+                (DONE, json.dumps(result), now, job_id, LEASED, worker_id))
+            if cursor.rowcount != 1:
+                # Lease was lost; another worker owns (or finished) the job now
+                conn.execute('ROLLBACK')
+                logging.warning(f"Discarding result for job {job_id}: lease no longer held by {worker_id}")
+                return False
+
+            # Unblock dependents of this job whose dependencies are now all done
+            for dependent in self._blocked_dependents(conn, job_id):
+                pending = conn.execute(
+                    """SELECT COUNT(*) FROM job_deps AS d JOIN jobs AS j ON j.id = d.depends_on
+                       WHERE d.job_id = ? AND j.status != ?""",
+                    (dependent, DONE)).fetchone()[0]
+                if pending == 0:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                        (QUEUED, now, now, dependent))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def fail(self, job_id, worker_id, error, retry_delay=None):
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+        now = time.time()
+        conn = self._transaction()
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?",
+                (job_id, LEASED, worker_id)).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return False
+
+            if row['attempts'] >= row['max_attempts']:
+                status, available_at = DEAD, now
+            else:
+                # Exponential backoff between attempts
+                status, available_at = QUEUED, now + retry_delay * 2 ** (row['attempts'] - 1)
+            conn.execute(
+                """UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL,
+                                   available_at = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, str(error), available_at, now, job_id))
+            if status == DEAD:
+                self._cascade_dead(conn, job_id, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def _blocked_dependents(self, conn, job_id):
+        """Ids of blocked jobs that wait on job_id"""
+        return [row['job_id'] for row in conn.execute(
+            """SELECT d.job_id FROM job_deps AS d JOIN jobs AS j ON j.id = d.job_id
+               WHERE d.depends_on = ? AND j.status = ?""",
+            (job_id, BLOCKED))]
+
+    def _cascade_dead(self, conn, job_id, now):
+        """Mark every blocked job downstream of the dead job_id dead as well"""
+        pending = [job_id]
+        while pending:
+            for dependent in self._blocked_dependents(conn, pending.pop()):
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = 'dependency failed', updated_at = ? WHERE id = ?",
+                    (DEAD, now, dependent))
+                pending.append(dependent)
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+
+# Backends selectable through JOB_QUEUE_BACKEND
+BACKENDS = {
+    'sqlite': SQLiteJobQueue,
+}
+
+
+def get_job_queue(backend=None, **kwargs):
+    """Create the configured queue backend"""
+    backend = backend or os.getenv('JOB_QUEUE_BACKEND', 'sqlite')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown job queue backend: {backend}")
+    return BACKENDS[backend](**kwargs)
+
+
+def submit_comparison(job_queue, url1, url2, use_curl=False):
+    """Enqueue the jobs for one comparison.
+
+    Without curl, both URLs are first detected, and both crawl jobs wait
+    on both detect jobs so they use the same crawler, as index() does.
+    The compare job waits on the two crawls. Returns the id of the
+    compare job, whose result holds the comparison.
+    """
+    detect_ids = [] if use_curl else [
+        job_queue.enqueue('detect', {'target': url}, domain=domain_of(url))
+        for url in (url1, url2)
+    ]
+    crawl_ids = [
+        job_queue.enqueue('crawl', {'target': url, 'use_curl': bool(use_curl)},
+                          domain=domain_of(url), depends_on=detect_ids)
+        for url in (url1, url2)
+    ]
+    return job_queue.enqueue('compare', {'url1': url1, 'url2': url2}, depends_on=crawl_ids)
+
+
+if __name__ == "__main__":
+    # Example usage of SQLiteJobQueue
+    job_queue = SQLiteJobQueue(path=':memory:')
+
+    print("Testing SQLiteJobQueue...")
+    compare_id = submit_comparison(job_queue, "https://example.com", "https://python.org")
+    print(f"\nCompare job {compare_id} status: {job_queue.get(compare_id)['status']}")
+
+    while True:
+        job = job_queue.lease('example-worker', stages=['detect', 'crawl'])
+        if job is None:
+            break
+        print(f"Leased {job['stage']} job for {job['payload']['target']} (domain {job['domain']})")
+        if job['stage'] == 'detect':
+            result = {'is_pwa': False}
+        else:
+            result = {'content': f"content of {job['payload']['target']}"}
+        job_queue.complete(job['id'], 'example-worker', result)
+
+    print(f"\nCompare job {compare_id} status: {job_queue.get(compare_id)['status']}")
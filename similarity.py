@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class SimilarityMatrix:
+    """Local cosine similarity over hashed word-shingle TF-IDF vectors.
+
+    Raw shingle counts are cached per content hash, so a reference page
+    compared against many variants is only tokenized once. TF-IDF weights
+    depend on the whole batch and are recomputed for each call.
+    """
+
+    def __init__(self, shingle_size=3, n_features=2 ** 20, max_cache_size=10000):
+        self.shingle_size = shingle_size
+        self.n_features = n_features
+        self.max_cache_size = max_cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def preprocess_text(self, text):
+        """Normalize whitespace and case before shingling"""
+        return ' '.join((text or '').lower().split())
+
+    def _shingle_counts(self, text):
+        """Sparse 1 x n_features row of hashed shingle counts for text"""
+        text = self.preprocess_text(text)
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        words = text.split()
+        if len(words) <= self.shingle_size:
+            shingles = [' '.join(words)] if words else []
+        else:
+            shingles = [' '.join(words[i:i + self.shingle_size])
+                        for i in range(len(words) - self.shingle_size + 1)]
+
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % self.n_features for s in shingles),
+                             dtype=np.int64, count=len(shingles))
+        columns, counts = np.unique(hashes, return_counts=True)
+        row = sp.csr_matrix((counts.astype(np.float64), (np.zeros_like(columns), columns)),
+                            shape=(1, self.n_features))
+
+        with self._lock:
+            self._cache[key] = row
+            if len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+        return row
+
+    def _weight(self, counts, idf):
+        """Turn a matrix of shingle counts into L2-normalized TF-IDF rows"""
+        # Sublinear term frequency
+        tf = counts.copy()
+        tf.data = 1.0 + np.log(tf.data)
+        weighted = tf.multiply(idf).tocsr()
+
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags(1.0 / norms) @ weighted
+
+    def _idf(self, counts):
+        """Smoothed inverse document frequency over the rows of counts"""
+        n_docs = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=self.n_features)
+        return np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+    def compute(self, texts_a, texts_b=None):
+        """Cosine similarities between every text in texts_a and texts_b.
+
+        Returns an len(texts_a) x len(texts_b) array in [0, 1]. Without
+        texts_b, texts_a is compared against itself.
+        """
+        texts_a = list(texts_a)
+        texts_b = None if texts_b is None else list(texts_b)
+        if not texts_a or texts_b == []:
+            return np.zeros((len(texts_a), len(texts_a if texts_b is None else texts_b)))
+
+        # Shared IDF so both sides are weighted on the same scale
+        all_texts = texts_a if texts_b is None else texts_a + texts_b
+        counts = sp.vstack([self._shingle_counts(text) for text in all_texts], format='csr')
+        vectors = self._weight(counts, self._idf(counts))
+        vectors_a = vectors[:len(texts_a)]
+        vectors_b = vectors_a if texts_b is None else vectors[len(texts_a):]
+        return np.clip((vectors_a @ vectors_b.T).toarray(), 0.0, 1.0)
+
+    def score(self, text1, text2):
+        """Similarity of a single pair as a 0-100 percentage"""
+        return round(float(self.compute([text1], [text2])[0, 0]) * 100, 1)
+
+    def top_pairs(self, scores, k=5, most_similar=True, exclude_diagonal=False):
+        """The k most (or least) similar (i, j, score) pairs of a score matrix"""
+        scores = np.array(scores, dtype=np.float64)
+        if exclude_diagonal:
+            # Self-comparison: drop i == j and count each unordered pair once
+            mask = np.triu(np.ones(scores.shape, dtype=bool), k=1)
+        else:
+            mask = np.ones(scores.shape, dtype=bool)
+
+        candidates = np.flatnonzero(mask)
+        values = scores.ravel()[candidates]
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+
+        keyed = -values if most_similar else values
+        selected = np.argpartition(keyed, k - 1)[:k]
+        selected = selected[np.argsort(keyed[selected], kind='stable')]
+        rows, cols = np.unravel_index(candidates[selected], scores.shape)
+        return [(int(i), int(j), float(scores[i, j])) for i, j in zip(rows, cols)]
+
+
+if __name__ == "__main__":
+    # Example usage of SimilarityMatrix
+    matrix = SimilarityMatrix()
+
+    reference = ["Python is a high-level programming language known for its simplicity."]
+    variants = [
+        "Python is a high-level programming language known for its simplicity.",
+        "Python is a high-level programming language known for its readability.",
+        "Rust is a systems programming language focused on safety.",
+    ]
+
+    print("Testing SimilarityMatrix...")
+    scores = matrix.compute(reference, variants)
+    print(f"\nScores against reference:\n{np.round(scores, 3)}")
+    print(f"\nMost similar: {matrix.top_pairs(scores, k=2)}")
+    print(f"Least similar: {matrix.top_pairs(scores, k=2, most_similar=False)}")
@@ -0,0 +1,151 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from content_processor import ContentProcessor
+from comparator import ContentComparator
+from crawl_pool import CrawlWorkerPool
+from curl_crawler import CurlCrawler
+from job_queue import get_job_queue
+
+
+class ComparisonWorker:
+    """Pulls crawl and compare jobs from the queue and writes results back"""
+
+    def __init__(self, job_queue, stages=('detect', 'crawl', 'compare'), crawl_pool=None,
+                 content_processor=None, comparator=None, poll_interval=1.0):
+        self.job_queue = job_queue
+        self.stages = list(stages)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.crawl_pool = crawl_pool
+        self.curl_crawler = CurlCrawler()
+        self.content_processor = content_processor
+        self.comparator = comparator
+        if ('detect' in self.stages or 'crawl' in self.stages) and self.crawl_pool is None:
+            self.crawl_pool = CrawlWorkerPool()
+        if 'compare' in self.stages:
+            api_key = os.getenv('OPENAI_API_KEY')
+            self.content_processor = self.content_processor or ContentProcessor(api_key)
+            self.comparator = self.comparator or ContentComparator(api_key, self.content_processor)
+        self._stopping = threading.Event()
+
+    def detect(self, payload):
+        """Detect stage: check whether the site is a PWA/React application"""
+        is_pwa = self.crawl_pool.run('pwa', 'is_pwa_or_react', payload['target'])
+        if is_pwa is None:
+            # No verdict (no free worker, killed or failed): retry the job rather than assume False
+            raise RuntimeError(f"PWA/React detection did not complete for {payload['target']}")
+        return {'is_pwa': is_pwa}
+
+    def crawl(self, job):
+        """Crawl stage: extract the site's text"""
+        target = job['payload']['target']
+        if job['payload'].get('use_curl'):
+            curl_command = self.curl_crawler.get_curl_from_browser(target)
+            return {
+                'content': self.crawl_pool.extract_content('curl', curl_command),
+                'is_pwa': None,
+                'curl_command': curl_command,
+            }
+
+        # Both sides depend on both detect jobs; like index(), use the PWA
+        # crawler for both if either site is a PWA/React application
+        detect_jobs = [self.job_queue.get(job_id) for job_id in job['depends_on']]
+        is_pwa = next(d['result']['is_pwa'] for d in detect_jobs if d['payload']['target'] == target)
+        use_pwa_crawler = any(d['result']['is_pwa'] for d in detect_jobs)
+        selected_crawler = 'pwa' if use_pwa_crawler else 'selenium'
+        return {
+            'content': self.crawl_pool.extract_content(selected_crawler, target),
+            'is_pwa': is_pwa,
+        }
+
+    def compare(self, job):
+        """Compare stage: compare the contents produced by the crawl jobs"""
+        crawl1, crawl2 = (self.job_queue.get(job_id)['result'] for job_id in job['depends_on'])
+        if not crawl1['content'] or not crawl2['content']:
+            raise RuntimeError("Failed to fetch content from one or both URLs")
+
+        processed_content1 = self.content_processor.prepare_content(crawl1['content'])
+        processed_content2 = self.content_processor.prepare_content(crawl2['content'])
+        return {
+            'comparison_result': self.comparator.compare_contents(processed_content1, processed_content2,
+                                                                  raise_errors=True),
+            'is_pwa1': crawl1.get('is_pwa'),
+            'is_pwa2': crawl2.get('is_pwa'),
+            'url1': job['payload']['url1'],
+            'url2': job['payload']['url2'],
+        }
+
+    def _heartbeat(self, job_id, done):
+        """Keep the lease alive while a long crawl or comparison runs"""
+        interval = self.job_queue.lease_seconds / 3
+        while not done.wait(interval):
+            if not self.job_queue.extend_lease(job_id, self.worker_id):
+                logging.warning(f"Lost lease on job {job_id}")
+                return
+
+    def run_once(self):
+        """Lease and run a single job. Returns False if none was available."""
+        job = self.job_queue.lease(self.worker_id, stages=self.stages)
+        if job is None:
+            return False
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], done), daemon=True)
+        heartbeat.start()
+        try:
+            if job['stage'] == 'detect':
+                result = self.detect(job['payload'])
+            elif job['stage'] == 'crawl':
+                result = self.crawl(job)
+                if not result['content']:
+                    raise RuntimeError(f"Failed to fetch content from {job['payload']['target']}")
+            elif job['stage'] == 'compare':
+                result = self.compare(job)
+            else:
+                raise ValueError(f"Unknown job stage: {job['stage']}")
+            done.set()
+            self.job_queue.complete(job['id'], self.worker_id, result)
+        except Exception as e:
+            done.set()
+            logging.error(f"Job {job['id']} ({job['stage']}) failed: {str(e)}")
+            self.job_queue.fail(job['id'], self.worker_id, str(e))
+        finally:
+            heartbeat.join()
+        return True
+
+    def run_forever(self):
+        """Process jobs until stop() is called"""
+        logging.info(f"Worker {self.worker_id} processing stages: {', '.join(self.stages)}")
+        while not self._stopping.is_set():
+            try:
+                if not self.run_once():
+                    self._stopping.wait(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Worker {self.worker_id} error: {str(e)}")
+                time.sleep(self.poll_interval)
+        if self.crawl_pool:
+            self.crawl_pool.shutdown()
+
+    def stop(self):
+        self._stopping.set()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    # Run a worker node; WORKER_STAGES=detect,crawl gives a crawl-only node
+    stages = os.getenv('WORKER_STAGES', 'detect,crawl,compare').split(',')
+    worker = ComparisonWorker(get_job_queue(), stages=stages)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()